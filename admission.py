@@ -0,0 +1,92 @@
+"""Admission Controller.
+
+Concurrency limiter like asyncio.Semaphore, but the cap can be changed while tasks are waiting
+(mutating Semaphore._value at runtime is undefined behaviour).
+CreditLimiter limits the request rate instead: credits spent are refunded after a time window.
+"""
+
+import time
+import asyncio
+from collections import deque
+
+
+class AdmissionController:
+
+    """Limit concurrent work to `cap` slots, `cap` is adjustable at runtime."""
+
+    def __init__(self, cap: int, min_cap: int = 1, max_cap: int | None = None) -> None:
+        self.min_cap = min_cap
+        self.max_cap = max_cap or cap
+        self.cap = cap
+        self.active = 0
+        self.cond = asyncio.Condition()
+        # hill climbing state for tune()
+        self._step = 1
+        self._last_throughput: float | None = None
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.cap)
+            self.active += 1
+
+    async def release(self) -> None:
+        """Give back a slot and wake up one waiter.
+
+        The slot is given back before anything is awaited and the wake-up is shielded,
+        so a task cancelled on its way out (e.g. a TaskGroup abort) can't leak the slot or strand a waiter.
+        """
+        self.active -= 1
+        await asyncio.shield(self._notify_one())
+
+    async def _notify_one(self) -> None:
+        async with self.cond:
+            self.cond.notify(1)
+
+    async def set_cap(self, new_cap: int) -> None:
+        """Change the number of slots (clamped to min_cap..max_cap), waking all waiters to re-check."""
+        async with self.cond:
+            self.cap = max(self.min_cap, min(self.max_cap, new_cap))
+            self.cond.notify_all()
+
+    async def tune(self, throughput: float) -> None:
+        """Hill-climb the cap on observed throughput: keep moving while it improves, turn around when it drops or hits min_cap / max_cap."""
+        if self._last_throughput is not None and throughput < self._last_throughput:
+            self._step = -self._step
+        self._last_throughput = throughput
+        old_cap = self.cap
+        await self.set_cap(self.cap + self._step)
+        if self.cap == old_cap:  # clamped: pushing further that way is a no-op, head back inside the range
+            self._step = -self._step
+
+    async def __aenter__(self) -> None:
+        """Acquire a slot."""
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Release the slot."""
+        await self.release()
+
+
+class CreditLimiter:
+
+    """Allow at most `budget` credits to be spent per `refund_time` seconds, e.g. an API's requests per minute."""
+
+    def __init__(self, budget: int, refund_time: float = 60) -> None:
+        self.budget = budget
+        self.refund_time = refund_time
+        self._refunds: deque[float] = deque()  # monotonic time at which each spent credit comes back
+        self._lock = asyncio.Lock()  # waiters are served in order
+
+    async def spend(self, cost: int = 1) -> None:
+        """Wait until `cost` credits are available and spend them."""
+        cost = min(cost, self.budget)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._refunds and self._refunds[0] <= now:
+                    self._refunds.popleft()
+                if len(self._refunds) + cost <= self.budget:
+                    break
+                await asyncio.sleep(self._refunds[len(self._refunds) + cost - self.budget - 1] - now)
+            self._refunds.extend([now + self.refund_time] * cost)
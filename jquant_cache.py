@@ -0,0 +1,111 @@
+"""Persistent on-disk cache for J-Quants API responses.
+
+Responses are keyed by (endpoint, params) and stored as orjson blobs in a sqlite file,
+so repeated backtests over the same tickers / dates skip the network entirely.
+
+- queries pinned to a past date (OHLC for a given day) never change, they are kept forever
+- per-code queries without a date (fs_details, statements) grow with every new disclosure, they expire after CODE_ONLY_TTL_DAYS
+- empty responses (None) are cached too, e.g. OHLC on a holiday
+- concurrent misses for the same key share one in-flight request
+- sqlite and the (de)serialization of the blobs run in worker threads, not on the event loop
+- an admission controller, if given, is only held by the API request of a miss, never by a cache read
+"""
+
+# pypi
+import orjson
+
+# built-in
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import contextlib
+from pathlib import Path
+from datetime import date
+
+# local
+from admission import AdmissionController
+
+CACHE_DB = 'jquant_cache/responses.sqlite3'
+CODE_ONLY_TTL_DAYS = 7
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()  # one connection shared by the worker threads
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn  # noqa: PLW0603
+    if _conn is None:
+        Path(CACHE_DB).parent.mkdir(exist_ok=True, parents=True)
+        _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _conn.execute('PRAGMA journal_mode=WAL')
+        _conn.execute('PRAGMA synchronous=NORMAL')
+        _conn.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, payload BLOB)')
+    return _conn
+
+
+def _cache_key(endpoint: str, params: dict) -> str:
+    return hashlib.sha1(orjson.dumps([endpoint, sorted(params.items())])).hexdigest()  # noqa: S324
+
+
+def _expires_at(params: dict) -> float | None:
+    """Return None (never) for queries pinned to a date in the past, otherwise now + TTL."""
+    pinned = params.get('date') or params.get('to')
+    if pinned and date.fromisoformat(pinned) < date.today():  # noqa: DTZ011
+        return None
+    return time.time() + CODE_ONLY_TTL_DAYS * 86400
+
+
+def _lookup(key: str) -> tuple[bool, list[dict] | None]:
+    """Return (hit, data) for key, blocking: run it in a worker thread."""
+    with _lock:
+        hit = _connection().execute('SELECT expires_at, payload FROM responses WHERE key = ?', (key,)).fetchone()
+    if hit and (hit[0] is None or hit[0] > time.time()):
+        return True, orjson.loads(hit[1])
+    return False, None
+
+
+def _store(key: str, expires_at: float | None, data: list[dict] | None) -> None:
+    """Insert or replace the response for key, blocking: run it in a worker thread."""
+    payload = orjson.dumps(data)
+    with _lock:
+        conn = _connection()
+        conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?)', (key, expires_at, payload))
+        conn.commit()
+
+
+async def _fetch_and_store(jquant, endpoint: str, params: dict, key: str, admission: AdmissionController | None) -> list[dict] | None:
+    async with admission or contextlib.nullcontext():
+        # the client adds pagination keys to params, don't let that leak into the cache key
+        if endpoint == 'daily_quotes':
+            data = await jquant.query_ohlc(params=dict(params))
+        else:
+            data = await jquant.query_endpoint(endpoint=endpoint, params=dict(params))
+
+    await asyncio.to_thread(_store, key, _expires_at(params), data)
+    return data
+
+
+async def cached_query(jquant, endpoint: str, params: dict, admission: AdmissionController | None = None) -> list[dict] | None:
+    """Return the response of `endpoint` for `params`, from the cache if possible.
+
+    `daily_quotes` goes to jquant.query_ohlc, everything else to jquant.query_endpoint.
+    J-Quants takes a single code / date per call, so instead of batching codes,
+    callers asking for the same key while it is being fetched wait for that one request.
+    On a miss, the request waits for a slot of `admission` (if given), hits don't take one.
+    """
+    key = _cache_key(endpoint, params)
+    task = _inflight.get(key)
+    if task is None:
+        hit, data = await asyncio.to_thread(_lookup, key)
+        if hit:
+            return data
+        task = _inflight.get(key)  # another caller may have started the request while we were looking
+    if task is None:
+        task = asyncio.create_task(_fetch_and_store(jquant, endpoint, params, key, admission))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one cancelled waiter must not cancel the request the others wait for
+    return await asyncio.shield(task)
@@ -7,6 +7,7 @@
 
 # built-in
 from typing import Any, LiteralString
+from functools import lru_cache
 from operator import methodcaller
 from datetime import date, timedelta
 
@@ -15,6 +16,13 @@ from structlogger import get_logger
 
 log_calc = get_logger('calc')
 
+
+@lru_cache(maxsize=4096)
+def parse_date(s: str) -> date:
+    """Memoized date.fromisoformat, the same disclosure dates repeat across tickers and analysis dates."""
+    return date.fromisoformat(s)
+
+
 # these are for possible later use to add not-immediately-liquid cash-like assets to roc and ev calc.
 cash_fields = [
     'Cash and deposits',
@@ -85,7 +93,7 @@ def jquant_calculate_ncav(fs_details: list[dict], analysisdate: str | None = Non
         return None
     st = None
     if analysisdate:
-        analysisdate = date.fromisoformat(analysisdate)
+        analysisdate = parse_date(analysisdate)
 
         # sort by disclosure date
         fs_details.sort(key=methodcaller('get', 'DisclosedDate', ''))
@@ -94,7 +102,7 @@ def jquant_calculate_ncav(fs_details: list[dict], analysisdate: str | None = Non
         # the earliest statement is e.g. 2025, nothing before
         # while the analysis date is 2023, we had no access to
         # that at that time
-        if date.fromisoformat(fs_details[0]['DisclosedDate']) > analysisdate:
+        if parse_date(fs_details[0]['DisclosedDate']) > analysisdate:
             log_calc.warning(
                 f'no earlier fs_details found than analysis \
 date for ticker {fs_details[0].get("LocalCode")}. Earliest \
@@ -106,7 +114,7 @@ Disclosed Financial Statements is for {fs_details[0]["DisclosedDate"]}. Skipping
         # the latest statement is e.g. 2020, nothing after
         # shall we look at that for a ticker analysed in 2023?
         # how much is too much? maybe half a year?
-        if (analysisdate - date.fromisoformat(fs_details[-1]['DisclosedDate'])).days > max_lookbehind:
+        if (analysisdate - parse_date(fs_details[-1]['DisclosedDate'])).days > max_lookbehind:
             log_calc.warning(
                 f'latest fs_details are too old for  our analysis \
 date for ticker {fs_details[-1].get("LocalCode")}. Latest \
@@ -116,7 +124,7 @@ Disclosed Financial Statements is for {fs_details[-1]["DisclosedDate"]}. Skippin
 
         # find latest statement before analysis date
         for i, record in enumerate(fs_details):
-            if (date.fromisoformat(record['DisclosedDate']) - analysisdate).days > 0:
+            if (parse_date(record['DisclosedDate']) - analysisdate).days > 0:
                 st = fs_details[0] if i == 0 else fs_details[i - 1]
                 del i, record
                 break
@@ -204,7 +212,7 @@ def jquant_extract_os(statements: list[dict], analysisdate: str | None = None, m
         return None
 
     if analysisdate:
-        analysisdate = date.fromisoformat(analysisdate)
+        analysisdate = parse_date(analysisdate)
 
         # sort by disclosure date
         statements.sort(key=methodcaller('get', 'DisclosedDate', ''))
@@ -213,7 +221,7 @@ def jquant_extract_os(statements: list[dict], analysisdate: str | None = None, m
         # the earliest statement is e.g. 2025, nothing before
         # while the analysis date is 2023, we had no access to
         # that at that time
-        if date.fromisoformat(statements[0]['DisclosedDate']) > analysisdate:
+        if parse_date(statements[0]['DisclosedDate']) > analysisdate:
             log_calc.warning(
                 f'no earlier statements found than analysis \
 date for ticker {statements[0].get("LocalCode")}. Earliest \
@@ -225,7 +233,7 @@ Disclosed Financial Statements is for {statements[0]["DisclosedDate"]}. Skipping
         # the latest statement is e.g. 2020, nothing after
         # shall we look at that for a ticker analysed in 2023?
         # how much is too much? maybe half a year?
-        if (analysisdate - date.fromisoformat(statements[-1]['DisclosedDate'])).days > max_lookbehind:
+        if (analysisdate - parse_date(statements[-1]['DisclosedDate'])).days > max_lookbehind:
             log_calc.warning(
                 f'latest statements are too old for our analysis \
 date for ticker {statements[-1].get("LocalCode")}. Latest \
@@ -235,7 +243,7 @@ Disclosed Financial Statements is for {statements[-1]["DisclosedDate"]}. Skippin
 
         # find latest statement before analysis date
         for i, record in enumerate(statements):
-            if (date.fromisoformat(record['DisclosedDate']) - analysisdate).days > 0:
+            if (parse_date(record['DisclosedDate']) - analysisdate).days > 0:
                 st = statements[0] if i == 0 else statements[i - 1]
                 del i, record
                 break
@@ -272,7 +280,7 @@ def jquant_extract_dividends(dividend_data: dict, analysisdate: str | None = Non
     if not dividend_data:
         return {'ttm_dividend': 0.0}
 
-    adate = date.fromisoformat(analysisdate)
+    adate = parse_date(analysisdate)
     one_year_ago = adate - timedelta(days=365)
 
     ttm_dividend = 0.0
@@ -283,7 +291,7 @@ def jquant_extract_dividends(dividend_data: dict, analysisdate: str | None = Non
         if not record_date_str:
             continue
         try:
-            record_date = date.fromisoformat(record_date_str)
+            record_date = parse_date(record_date_str)
         except ValueError:
             continue
 
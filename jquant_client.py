@@ -2,6 +2,7 @@
 
 # pypi
 import httpx
+import orjson
 import pandas as pd
 from dotenv import dotenv_values, set_key
 from tenacity import retry, stop_after_attempt, wait_random_exponential
@@ -15,6 +16,7 @@ from pathlib import Path
 from http import HTTPStatus
 
 # local
+from admission import CreditLimiter
 from structlogger import get_logger
 
 log_cli = get_logger('cli')
@@ -40,8 +42,37 @@ class JQuantAPIClient:
     PASS = ''
     JQUANT_DATA_FOLDER = ''
 
-    def __init__(self) -> None:
+    def __init__(self, max_connections: int = 10, requests_per_minute: int | None = None) -> None:
         self.classinit()
+        # one connection pool per client instance, so TCP/TLS handshakes are reused across requests
+        self.max_connections = max_connections
+        self.session = requests.Session()
+        self._http: httpx.AsyncClient | None = None
+        # every async request (pages and retries included) spends a credit, None: no rate limit
+        self.limiter = CreditLimiter(requests_per_minute, refund_time=60) if requests_per_minute else None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared async HTTP client, created on first use (inside the running event loop)."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=30,
+            )
+        return self._http
+
+    async def _get(self, url: str, params: dict) -> httpx.Response:
+        """GET on the shared async client, waiting for a rate limit credit first."""
+        if self.limiter is not None:
+            await self.limiter.spend()
+        return await self.http.get(url, headers=self.HEADERS, params=params, timeout=30)
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     @classmethod
     def classinit(cls) -> None:
@@ -142,14 +173,14 @@ class JQuantAPIClient:
                 i += 1
                 continue
 
-            res = requests.get(f'{self.API_URL}/v1/listed/info', params=params, headers=headers, timeout=30)
+            res = self.session.get(f'{self.API_URL}/v1/listed/info', params=params, headers=headers, timeout=30)
             if res.status_code == HTTPStatus.OK:
-                d = res.json()
+                d = orjson.loads(res.content)
                 data = d['info']
                 while 'pagination_key' in d:
                     params['pagination_key'] = d['pagination_key']
-                    res = requests.get(f'{self.API_URL}/v1/listed/info', params=params, headers=headers, timeout=30)
-                    d = res.json()
+                    res = self.session.get(f'{self.API_URL}/v1/listed/info', params=params, headers=headers, timeout=30)
+                    d = orjson.loads(res.content)
                     data += d['info']
                 df = pd.DataFrame(data)
                 if i == 0:
@@ -181,63 +212,45 @@ class JQuantAPIClient:
     async def query_endpoint(self, endpoint: str, params: dict) -> list[dict] | None:
         """General API query to Jquants fins endpoints."""
         endpoint_url = f'{self.API_URL}/v1/fins/{endpoint}'
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                endpoint_url,
-                headers=self.HEADERS,
-                params=params,
-                timeout=30,
-            )
-            response.raise_for_status()
-            if response.status_code == HTTPStatus.OK:
-                data = []
-                if response.json()[endpoint]:
-                    data += response.json()[endpoint]
-                    while 'pagination_key' in response.json():
-                        params['pagination_key'] = response.json()['pagination_key']
-                        response = await client.get(
-                            endpoint_url,
-                            headers=self.HEADERS,
-                            params=params,
-                            timeout=30,
-                        )
-                        data += response.json()[endpoint]
-                    # log_cli.info(f'{len(data)} {endpoint} acquired for {params=}')
-                    return data
-                # log_cli.warning(f'empty {endpoint} data for {params=}')
-                return None
-            log_cli.exception(f'Error: {response.status_code} - {response.text}')
+        response = await self._get(endpoint_url, params)
+        response.raise_for_status()
+        if response.status_code == HTTPStatus.OK:
+            data = []
+            d = orjson.loads(response.content)
+            if d[endpoint]:
+                data += d[endpoint]
+                while 'pagination_key' in d:
+                    params['pagination_key'] = d['pagination_key']
+                    response = await self._get(endpoint_url, params)
+                    d = orjson.loads(response.content)
+                    data += d[endpoint]
+                # log_cli.info(f'{len(data)} {endpoint} acquired for {params=}')
+                return data
+            # log_cli.warning(f'empty {endpoint} data for {params=}')
             return None
+        log_cli.exception(f'Error: {response.status_code} - {response.text}')
+        return None
 
     @retry(stop=(stop_after_attempt(6)), wait=wait_random_exponential(min=5, max=60))
     async def query_ohlc(self, params: dict) -> list[dict] | None:
         """General API query to Jquants prices endpoints."""
         stub = 'daily_quotes'
         endpoint_url = f'{self.API_URL}/v1/prices/{stub}'
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                endpoint_url,
-                headers=self.HEADERS,
-                params=params,
-                timeout=30,
-            )
-            response.raise_for_status()
-            if response.status_code == HTTPStatus.OK:
-                data = []
-                if response.json()[stub]:
-                    data += response.json()[stub]
-                    while 'pagination_key' in response.json():
-                        params['pagination_key'] = response.json()['pagination_key']
-                        response = await client.get(
-                            endpoint_url,
-                            headers=self.HEADERS,
-                            params=params,
-                            timeout=30,
-                        )
-                        data += response.json()[stub]
-                    # log_cli.info(f'{len(data)} {stub} acquired for {params=}')
-                    return data
-                # log_cli.warning(f'empty {stub} data for {params=}')
-                return None
-            log_cli.warning(f'Error: {response.status_code} - {response.text}')
+        response = await self._get(endpoint_url, params)
+        response.raise_for_status()
+        if response.status_code == HTTPStatus.OK:
+            data = []
+            d = orjson.loads(response.content)
+            if d[stub]:
+                data += d[stub]
+                while 'pagination_key' in d:
+                    params['pagination_key'] = d['pagination_key']
+                    response = await self._get(endpoint_url, params)
+                    d = orjson.loads(response.content)
+                    data += d[stub]
+                # log_cli.info(f'{len(data)} {stub} acquired for {params=}')
+                return data
+            # log_cli.warning(f'empty {stub} data for {params=}')
             return None
+        log_cli.warning(f'Error: {response.status_code} - {response.text}')
+        return None
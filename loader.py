@@ -4,12 +4,12 @@ import dill
 # built-in
 import sys
 import time
-import pickle
 from pathlib import Path
 from collections import defaultdict
 
 # local
 from structlogger import configure_logging, get_logger
+from ohlc_streamcollector import pickle_stream_load_or_empty
 
 # directories
 INPUT_DATA_PATH_PICKLE = 'data/ohlc.pkl'
@@ -26,22 +26,13 @@ def nested_defaultdict_factory():
     return defaultdict(dict)
 
 def pickle_load(data_file_path: str):
-    log_main.info(f'-- Attempting to load data with PICKLE from {data_file_path} --')
-    if not Path(data_file_path).exists():
-        log_main.warning('Pickle file not found. Starting with an empty dataset.')
-        return defaultdict(nested_defaultdict_factory)
-
+    """Load the collector's output: the last snapshot + the records appended after it (e.g. by an interrupted run)."""
     start_time = time.time()
-    try:
-        with open(data_file_path, 'rb') as f:
-            d = pickle.load(f)
-        log_main.info(
-            f'Pickle load successful in: {time.time() - start_time:.4f} seconds'
-        )
-        return d
-    except Exception as e:
-        log_main.error(f'Failed to load pickle file: {e}. Starting fresh.')
-        return defaultdict(nested_defaultdict_factory)
+    d = pickle_stream_load_or_empty(data_file_path)
+    log_main.info(
+        f'Pickle load of {len(d)} tickers finished in: {time.time() - start_time:.4f} seconds'
+    )
+    return d
 
 def dill_load(data_file_path: str):
     log_main.info(f'-- Attempting to load data with DILL from {data_file_path} --')
@@ -6,7 +6,7 @@ from collections import defaultdict
 from datetime import date, timedelta
 
 # local
-from loader_with_filter import pickle_load
+from ohlc_streamcollector import pickle_stream_load_or_empty
 import jquant_get_st_fs
 
 
@@ -15,8 +15,8 @@ def nested_defaultdict_factory() -> defaultdict[dict]:
     return defaultdict(dict)
 
 
-st_fs_dv_data: defaultdict = pickle_load(data_file_path='data/fs_st_div.pkl')
-ohlc_data: defaultdict = pickle_load(data_file_path='data/ohlc.pkl')
+st_fs_dv_data: dict = pickle_stream_load_or_empty('data/fs_st_div.pkl')
+ohlc_data: dict = pickle_stream_load_or_empty('data/ohlc.pkl')
 
 analysis_dates = [
     '2010-12-21',
@@ -2,32 +2,48 @@
 
 Given a list of selected dates,
 - Fetch a list of all asset tickers traded on TSE
-- Fetch detailed balance sheets for each ticker & date
+- Fetch detailed balance sheets for each ticker (once, shared by all dates)
 - Calculate NCAVPS for each
 - Return a list of tickers filtered by NCAVPS_LIMIT
 """
 
 # pypi
-import aiofiles
 import asyncio
 import datetime
 import better_exceptions
 
+try:  # optional faster event loop, not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # built-in
 import uuid
 import time
+import contextlib
+from typing import TextIO
 from pathlib import Path
-from asyncio import Lock, Semaphore
-from collections import defaultdict
 
 # local
 import jquant_calc
+import jquant_cache
 import jquant_client
+from admission import AdmissionController
 from perflogger import periodic_perf_logger
 from structlogger import configure_logging, get_logger
 
-# Limit concurrent API calls
+# Limit concurrent API calls, the limit is tuned at runtime between 1 and SEMAPHORE_MAX_LIMIT based on throughput
 SEMAPHORE_LIMIT = 5
+SEMAPHORE_MAX_LIMIT = 10
+
+# J-Quants requests per minute allowed by the subscription plan, None: only the admission cap limits the requests
+API_REQUESTS_PER_MINUTE = None
+
+# analysis dates processed at the same time, so the straggler tickers of one date overlap with the next date
+# (not all of them: every running date keeps its own in-memory closing prices)
+DATE_CONCURRENCY = 2
+# tickers in flight per analysis date, comfortably above SEMAPHORE_MAX_LIMIT so the admission cap stays saturated
+WORKERS_PER_DATE = 2 * SEMAPHORE_MAX_LIMIT
 
 # NVACPS LIMIT
 NCAVPS_LIMIT = 0.8
@@ -49,11 +65,16 @@ NETNET_HEADER = (
     'ticker,analysis_date,ncavps,share_price,mos_rate,market_cap,enterprise_value,ey_shares_out,ey_net_income,operating_profit,ey_gross_debt,ey_pe,ey_ev,roc_current_assets,roc_current_liabilities,roc_cash_and_equivalents,roc_property,roc_nwc_oper,roc_capital_base,roc,fs_gross_debt_fields,fs_date,st_date,fs_st_skew_days,st_report_type,fs_report_type\n'
 )
 
+# process_ticker result kinds
+NETNET = 'netnet'
+NO_OHLC = 'no_ohlc'
+
 GLACIUS_UUID = 94558092206834
 ELEMENT_UUID = 91765249380
 
-ON_ELEMENT = ELEMENT_UUID == uuid.getnode()
-ON_GLACIUS = GLACIUS_UUID == uuid.getnode()
+_NODE = uuid.getnode()  # can be slow (scans network interfaces), so only once
+ON_ELEMENT = ELEMENT_UUID == _NODE
+ON_GLACIUS = GLACIUS_UUID == _NODE
 
 ULTIMATE_LOGDIR = GLACIUS_LOGDIR if ON_GLACIUS else LOCAL_LOGDIR
 
@@ -90,286 +111,362 @@ def _safe_float(x, default=0.0) -> float:
         return float(default)
 
 
-async def process_ticker(  # noqa: ANN201, PLR0913
+def _append_line(fname: str, line: str, header: str | None = None) -> None:
+    """Append a line to a file, writing `header` first if the file is new.
+
+    Blocking: meant to be run via `asyncio.to_thread` so open + write is a single executor hop.
+    """
+    with Path(fname).open('a', encoding='utf-8') as f:
+        if header and not f.tell():
+            f.write(header)
+        f.write(line)
+
+
+async def fetch_static(ticker: str, admission: AdmissionController, jquant: jquant_client.JQuantAPIClient) -> tuple[list[dict] | None, list[dict] | None]:
+    """Fetch the date-independent data of a ticker: fs_details and statements, from the disk cache once warmed up.
+
+    Only a cache miss (i.e. the warm-up) takes an admission slot, reading the cache back per date doesn't compete with the API calls.
+    """
+    # NCAV data from https://jpx.gitbook.io/j-quants-en/api-reference/statements-1
+    fs_details = await jquant_cache.cached_query(jquant, 'fs_details', {'code': ticker}, admission)
+    if not fs_details:
+        log_main.debug('No fs_details for %s', ticker)
+        return None, None
+
+    # for NCAVPS: getting outstanding shares from https://jpx.gitbook.io/j-quants-en/api-reference/statements
+    statements = await jquant_cache.cached_query(jquant, 'statements', {'code': ticker}, admission)
+    return fs_details, statements
+
+
+async def close_prices(day: str, closes: dict[str, dict[str, float]], admission: AdmissionController, jquant: jquant_client.JQuantAPIClient) -> dict[str, float]:
+    """Get the closing price of every TSE ticker on `day` as {code: close}.
+
+    One market-wide daily_quotes request per date instead of one per ticker, memoized in `closes`.
+    Only downloading a day takes an admission slot, memo and cache hits don't wait for one.
+    """
+    if day not in closes:
+        quotes = await jquant_cache.cached_query(jquant, 'daily_quotes', {'date': day}, admission)
+        closes[day] = {q['Code']: q['Close'] for q in quotes or () if q.get('Close')}
+    return closes[day]
+
+
+async def process_ticker(  # noqa: PLR0913
     ticker: str,
     analysis_date: str,
-    data_calculated: defaultdict,
-    fs_details: defaultdict,
-    statements: defaultdict,
-    ohlc_lock: Lock,
-    netnet_lock: Lock,
-    semaphore: Semaphore,
+    data_calculated: dict[tuple[str, str], dict],
+    closes: dict[str, dict[str, float]],
+    admission: AdmissionController,
     jquant: jquant_client.JQuantAPIClient,
-):
-    """Process a single ticker for an analysis date."""
-    async with semaphore:
-        log_main.debug(f'Processing ticker: {ticker} for {analysis_date}')
-
-        # NCAV data from https://jpx.gitbook.io/j-quants-en/api-reference/statements-1
-        fs_details_params = {'code': ticker}
-        if not fs_details[ticker]:
-            fs_details[ticker] = await jquant.query_endpoint(endpoint='fs_details', params=fs_details_params)
-        if fs_details[ticker]:
-            ncav_data = jquant_calc.jquant_calculate_ncav(
-                fs_details=fs_details[ticker],
-                analysisdate=analysis_date,
-                max_lookbehind=FS_LOOKBACK_LIMIT_DAYS,
-                # global_fs_keys=global_fs_keys
-            )
-            if not ncav_data:
-                return
-            data_calculated[ticker][analysis_date].update(ncav_data)
-        else:
-            log_main.debug(f'No fs_details for {ticker}')
-            return  # no fs_details, skip to next ticker
-
-        # for NCAVPS: getting outstanding shares from https://jpx.gitbook.io/j-quants-en/api-reference/statements
-        st_params = {'code': ticker}
-        if not statements[ticker]['statements']:
-            statements[ticker]['statements'] = await jquant.query_endpoint(endpoint='statements', params=st_params)
-        if statements[ticker]['statements']:
-            outstanding_shares_data = jquant_calc.jquant_extract_os(
-                statements=statements[ticker]['statements'],
-                analysisdate=analysis_date,
-                max_lookbehind=ST_LOOKBACK_LIMIT_DAYS,
-            )
-            if outstanding_shares_data:
-                data_calculated[ticker][analysis_date].update(outstanding_shares_data)
-            else:
-                log_main.debug(f'No quarterly statements for {ticker}')
-                return
+) -> tuple[str, str] | None:
+    """Process a single ticker for an analysis date, fs_details / statements are read back from the cache the warm-up filled.
+
+    Returns (NETNET, csv line) for a netnet stock, (NO_OHLC, ticker line) if there was no share price, None otherwise.
+    The caller writes them out once per analysis date.
+    """
+    log_main.debug('Processing ticker: %s for %s', ticker, analysis_date)
+    fs_details, statements = await fetch_static(ticker, admission, jquant)
+
+    if not fs_details:
+        return None  # no fs_details, skip to next ticker
+    ncav_data = jquant_calc.jquant_calculate_ncav(
+        fs_details=fs_details,
+        analysisdate=analysis_date,
+        max_lookbehind=FS_LOOKBACK_LIMIT_DAYS,
+        # global_fs_keys=global_fs_keys
+    )
+    if not ncav_data:
+        return None
+    row = data_calculated.setdefault((ticker, analysis_date), {})
+    row.update(ncav_data)
+
+    # outstanding shares
+    if statements:
+        outstanding_shares_data = jquant_calc.jquant_extract_os(
+            statements=statements,
+            analysisdate=analysis_date,
+            max_lookbehind=ST_LOOKBACK_LIMIT_DAYS,
+        )
+        if outstanding_shares_data:
+            row.update(outstanding_shares_data)
         else:
-            log_main.debug(f'No statements for {ticker}')
-            return
-
-        # Calculate NCAVPS
+            log_main.debug('No quarterly statements for %s', ticker)
+            return None
+    else:
+        log_main.debug('No statements for %s', ticker)
+        return None
+
+    # Calculate NCAVPS
+    ncav = row.get('fs_ncav_total')
+    shares = row.get('st_NumberOfIssuedAndOutstandingSharesAtTheEndOfFiscalYearIncludingTreasuryStock')
+    if not ncav or not shares:
+        log_main.warning(f'no ncav or number of shares data for {ticker}')
+        return None  # skip to next ticker if ncav or outstanding shares is zero / missing
+    ncavps = ncav / shares
+    row['ncavps'] = ncavps
+
+    # Also take note of the skew between disclosure dates
+    st_disclosure_date = row.get('st_disclosure_date')
+    ncavdatadate = row.get('fs_disclosure_date')
+    if st_disclosure_date and ncavdatadate:
+        row['fs_st_skew_days'] = (jquant_calc.parse_date(st_disclosure_date) - jquant_calc.parse_date(ncavdatadate)).days
+
+    # get the share price for the day of the ncav data
+    # only the API calls hold an admission slot (in close_prices), the lookups, calculations and file writes don't block new requests
+    close = (await close_prices(ncavdatadate, closes, admission, jquant)).get(ticker)
+    ohlc_attempt_limit = OHLC_LOOKBACK_LIMIT_DAYS
+    if not close:
+        fallback_date: datetime.date = jquant_calc.parse_date(ncavdatadate)
+        while ohlc_attempt_limit > 0:
+            ohlc_attempt_limit -= 1
+            fallback_date -= datetime.timedelta(days=1)
+            close = (await close_prices(fallback_date.isoformat(), closes, admission, jquant)).get(ticker)
+            if not close:
+                continue
+            row['share_price_at_ncav_date'] = close
+            break
+    else:
+        row['share_price_at_ncav_date'] = close
+    if ohlc_attempt_limit == 0:
+        log_main.warning(f'No OHLC data found for {ticker}, even going {OHLC_LOOKBACK_LIMIT_DAYS} days back...')
+        return NO_OHLC, f'{ticker}\n'
+
+    # the asset is netnet if the share price is less than NVACPS_LIMIT * 100 % of the ncavps
+    shareprice = close
+    MoS_rate = shareprice / ncavps
+    is_netnet = shareprice < (ncavps * NCAVPS_LIMIT)
+    row['netnet'] = is_netnet
+
+    if is_netnet:
         try:
-            data_calculated[ticker][analysis_date]['ncavps'] = data_calculated[ticker][analysis_date].get('fs_ncav_total', 0.0) / data_calculated[ticker][analysis_date].get(
-                'st_NumberOfIssuedAndOutstandingSharesAtTheEndOfFiscalYearIncludingTreasuryStock'
-            )
-            if not data_calculated[ticker][analysis_date].get('fs_ncav_total', 0.0):
-                raise ZeroDivisionError  # noqa: TRY301
-        except ZeroDivisionError:
-            log_main.warning(f'no number of shares data for {ticker}')
-            return  # skip to next ticker if ncav or outstanding shares is zero
-        except TypeError:
-            log_main.warning(f'No # of shares data found for {ticker}')
-            return
-
-        # Also take note of the skew between disclosure dates
-        st_disclosure_date = data_calculated[ticker][analysis_date].get('st_disclosure_date')
-        ncavdatadate = data_calculated[ticker][analysis_date].get('fs_disclosure_date')
-        if st_disclosure_date and ncavdatadate:
-            data_calculated[ticker][analysis_date]['fs_st_skew_days'] = (
-                datetime.datetime.fromisoformat(st_disclosure_date).date() - datetime.datetime.fromisoformat(ncavdatadate).date()
-            ).days
-
-        # get the share price for the day of the ncav data
-        ohlc_data_for_ncav_date = await jquant.query_ohlc(params={'code': ticker, 'date': ncavdatadate})
-        if not ohlc_data_for_ncav_date or not ohlc_data_for_ncav_date[0].get('Close', 0.0):
-            fallback_date = ncavdatadate
-            ohlc_attempt_limit = OHLC_LOOKBACK_LIMIT_DAYS
-            while ohlc_attempt_limit > 0:
-                ohlc_attempt_limit -= 1
-                fallback_date = datetime.datetime.fromisoformat(str(fallback_date)).date() - datetime.timedelta(days=1)
-                ohlc_data_for_ncav_date = await jquant.query_ohlc(params={'code': ticker, 'date': str(fallback_date)})
-                if not ohlc_data_for_ncav_date or not ohlc_data_for_ncav_date[0].get('Close', 0.0):
-                    continue
-                data_calculated[ticker][analysis_date]['share_price_at_ncav_date'] = ohlc_data_for_ncav_date[0].get('Close', 0.0)
-                break
-            if ohlc_attempt_limit == 0:
-                async with ohlc_lock:
-                    async with aiofiles.open(f'{ULTIMATE_LOGDIR}/no_ohlc_found_{analysis_date}.txt', 'a', encoding='utf-8') as f:
-                        await f.write(f'{ticker}\n')
-                log_main.warning(f'No OHLC data found for {ticker}, even going {OHLC_LOOKBACK_LIMIT_DAYS} days back...')
-                return
-        else:
-            data_calculated[ticker][analysis_date]['share_price_at_ncav_date'] = ohlc_data_for_ncav_date[0].get('Close', 0.0)
+            # earnings yield calculation
+            net_income = row.get('fs_profit_to_owners')
+            operating_profit = _safe_float(row.get('fs_operating_profit'))
+            gross_debt = row.get('fs_gross_debt')
+            cash_eq = _safe_float(row.get('fs_cash_and_equivalents'), 0.0)
 
-        # the asset is netnet if the share price is less than NVACPS_LIMIT * 100 % of the ncavps
-        shareprice = data_calculated[ticker][analysis_date].get('share_price_at_ncav_date', 999999)
-        MoS_rate = shareprice / data_calculated[ticker][analysis_date]['ncavps']
-        data_calculated[ticker][analysis_date]['netnet'] = shareprice < (data_calculated[ticker][analysis_date]['ncavps'] * NCAVPS_LIMIT)
+            # Compute market cap and EV defensively
+            market_cap = None
+            enterprise_value = None
 
-        if data_calculated[ticker][analysis_date]['netnet']:
             try:
-                # earnings yield calculation
-                share_price = data_calculated[ticker][analysis_date].get('share_price_at_ncav_date')
-                shares_out = data_calculated[ticker][analysis_date].get('st_NumberOfIssuedAndOutstandingSharesAtTheEndOfFiscalYearIncludingTreasuryStock')
-                net_income = data_calculated[ticker][analysis_date].get('fs_profit_to_owners')
-                operating_profit = _safe_float(data_calculated[ticker][analysis_date].get('fs_operating_profit'))
-                gross_debt = data_calculated[ticker][analysis_date].get('fs_gross_debt')
-                cash_eq = _safe_float(data_calculated[ticker][analysis_date].get('fs_cash_and_equivalents'), 0.0)
-
-                # Compute market cap and EV defensively
+                if shareprice and shares and float(shares) != 0:
+                    market_cap = float(shareprice) * float(shares)
+            except (TypeError, ValueError):
                 market_cap = None
-                enterprise_value = None
-
-                try:
-                    if share_price and shares_out and float(shares_out) != 0:
-                        market_cap = float(share_price) * float(shares_out)
-                except (TypeError, ValueError):
-                    market_cap = None
 
-                try:
-                    if market_cap:
-                        enterprise_value = float(market_cap) - cash_eq + gross_debt
-                except (TypeError, ValueError):
-                    enterprise_value = None
+            try:
+                if market_cap:
+                    enterprise_value = float(market_cap) - cash_eq + gross_debt
+            except (TypeError, ValueError):
+                enterprise_value = None
 
-                # Earnings yield (P/E-style): Net income / Market cap
+            # Earnings yield (P/E-style): Net income / Market cap
+            ey_pe = None
+            try:
+                if market_cap and float(market_cap) != 0 and net_income is not None:
+                    ey_pe = float(net_income) / float(market_cap)
+            except (TypeError, ValueError, ZeroDivisionError):
                 ey_pe = None
-                try:
-                    if market_cap and float(market_cap) != 0 and net_income is not None:
-                        ey_pe = float(net_income) / float(market_cap)
-                except (TypeError, ValueError, ZeroDivisionError):
-                    ey_pe = None
 
-                # Earnings yield (EV-based): EBIT / EV
+            # Earnings yield (EV-based): EBIT / EV
+            ey_ev = None
+            try:
+                if enterprise_value and float(enterprise_value) != 0 and operating_profit is not None:
+                    ey_ev = float(operating_profit) / float(enterprise_value)
+            except (TypeError, ValueError, ZeroDivisionError):
                 ey_ev = None
-                try:
-                    if enterprise_value and float(enterprise_value) != 0 and operating_profit is not None:
-                        ey_ev = float(operating_profit) / float(enterprise_value)
-                except (TypeError, ValueError, ZeroDivisionError):
-                    ey_ev = None
-
-                # Persist results
-                data_calculated[ticker][analysis_date]['ey_pe'] = ey_pe
-                data_calculated[ticker][analysis_date]['ey_ev'] = ey_ev
-                data_calculated[ticker][analysis_date]['market_cap'] = market_cap
-                data_calculated[ticker][analysis_date]['enterprise_value'] = enterprise_value
-                # Persist EY inputs
-                data_calculated[ticker][analysis_date]['ey_shares_out'] = shares_out
-                data_calculated[ticker][analysis_date]['ey_net_income'] = net_income
-                data_calculated[ticker][analysis_date]['operating_profit'] = operating_profit
-                data_calculated[ticker][analysis_date]['ey_gross_debt'] = gross_debt
-            except Exception as e:
-                log_main.warning(f'error in ey calculation for {ticker=} at {analysis_date=}')
 
-            try:
-                # roc Greenblatt-style proxy
-                # uses fileds:
-                # - fs_current_assets
-                # - fs_current_liabilities
-                # - fs_cash_and_equivalents
-                # - fs_property
-                # - fs_operating_profit
-
-                current_assets = data_calculated[ticker][analysis_date].get('fs_current_assets')
-                current_liabilities_val = data_calculated[ticker][analysis_date].get('fs_current_liabilities', None)
-                ppe = _safe_float(data_calculated[ticker][analysis_date].get('fs_property'), 0.0)
+            # Persist results
+            row['ey_pe'] = ey_pe
+            row['ey_ev'] = ey_ev
+            row['market_cap'] = market_cap
+            row['enterprise_value'] = enterprise_value
+            # Persist EY inputs
+            row['ey_shares_out'] = shares
+            row['ey_net_income'] = net_income
+            row['operating_profit'] = operating_profit
+            row['ey_gross_debt'] = gross_debt
+        except Exception as e:
+            log_main.warning(f'error in ey calculation for {ticker=} at {analysis_date=}')
 
+        try:
+            # roc Greenblatt-style proxy
+            # uses fileds:
+            # - fs_current_assets
+            # - fs_current_liabilities
+            # - fs_cash_and_equivalents
+            # - fs_property
+            # - fs_operating_profit
+
+            current_assets = row.get('fs_current_assets')
+            current_liabilities_val = row.get('fs_current_liabilities', None)
+            ppe = _safe_float(row.get('fs_property'), 0.0)
+
+            roc = None
+            try:
+                # Only proceed if we actually have current liabilities and operating profit
+                if current_liabilities_val is not None and operating_profit is not None:
+                    current_liabilities = _safe_float(current_liabilities_val, 0.0)
+
+                    if operating_profit is not None:
+                        # Operating net working capital excludes cash
+                        nwc_oper = current_assets - current_liabilities - cash_eq
+                        capital_base = nwc_oper + ppe
+
+                        denom = float(capital_base)
+                        roc = operating_profit / denom if denom > 0.0 else None
+            except Exception:
                 roc = None
-                try:
-                    # Only proceed if we actually have current liabilities and operating profit
-                    if current_liabilities_val is not None and operating_profit is not None:
-                        current_liabilities = _safe_float(current_liabilities_val, 0.0)
-
-                        if operating_profit is not None:
-                            # Operating net working capital excludes cash
-                            nwc_oper = current_assets - current_liabilities - cash_eq
-                            capital_base = nwc_oper + ppe
-
-                            denom = float(capital_base)
-                            roc = operating_profit / denom if denom > 0.0 else None
-                except Exception:
-                    roc = None
-
-                # Persist ROC result and inputs
-                data_calculated[ticker][analysis_date]['roc'] = roc
-                data_calculated[ticker][analysis_date]['roc_current_assets'] = current_assets
-                data_calculated[ticker][analysis_date]['roc_current_liabilities'] = current_liabilities if 'current_liabilities' in locals() else None
-                data_calculated[ticker][analysis_date]['roc_cash_and_equivalents'] = cash_eq
-                data_calculated[ticker][analysis_date]['roc_property'] = ppe
-                data_calculated[ticker][analysis_date]['operating_profit'] = operating_profit
-                data_calculated[ticker][analysis_date]['roc_nwc_oper'] = nwc_oper if 'nwc_oper' in locals() else None
-                data_calculated[ticker][analysis_date]['roc_capital_base'] = capital_base if 'capital_base' in locals() else None
-            except Exception as e:
-                log_main.warning(f'error in roc calculation for {ticker=} at {analysis_date=}. \r\n{e}')
-
-            # write the netnet csv data
-            log_main.info('netnet stock found!')
-            netnet_fname = f'{ULTIMATE_LOGDIR}/tse_netnets_{analysis_date}.csv'
-            async with netnet_lock:
-                netnet_file_exists = Path(netnet_fname).exists()
-                async with aiofiles.open(netnet_fname, 'a', encoding='utf-8') as f:
-                    if not netnet_file_exists:
-                        await f.write(NETNET_HEADER)
-                    await f.write(
-                        f'{ticker},'
-                        f'{analysis_date},'
-                        f'{data_calculated[ticker][analysis_date]["ncavps"]:.2f},'
-                        f'{shareprice},'
-                        f'{MoS_rate:.2f},'
-                        f'{data_calculated[ticker][analysis_date]["market_cap"]},'
-                        f'{data_calculated[ticker][analysis_date]["enterprise_value"]},'
-                        f'{data_calculated[ticker][analysis_date].get("ey_shares_out", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("ey_net_income", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("operating_profit", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("ey_gross_debt", "")},'
-                        f'{data_calculated[ticker][analysis_date]["ey_pe"]},'
-                        f'{data_calculated[ticker][analysis_date]["ey_ev"]},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_current_assets", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_current_liabilities", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_cash_and_equivalents", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_property", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_nwc_oper", "")},'
-                        f'{data_calculated[ticker][analysis_date].get("roc_capital_base", "")},'
-                        f'{data_calculated[ticker][analysis_date]["roc"]},'
-                        f'{data_calculated[ticker][analysis_date].get("fs_gross_debt_fields", "")},'
-                        f'{ncavdatadate},'
-                        f'{st_disclosure_date},'
-                        f'{data_calculated[ticker][analysis_date].get("fs_st_skew_days", "")},'
-                        f'{data_calculated[ticker][analysis_date]["st_report_type"]},'
-                        f'{data_calculated[ticker][analysis_date]["fs_report_type"]}\n'
-                    )
-            log_main.debug(f'Wrote netnet data for {ticker}')
 
+            # Persist ROC result and inputs
+            row['roc'] = roc
+            row['roc_current_assets'] = current_assets
+            row['roc_current_liabilities'] = current_liabilities if 'current_liabilities' in locals() else None
+            row['roc_cash_and_equivalents'] = cash_eq
+            row['roc_property'] = ppe
+            row['operating_profit'] = operating_profit
+            row['roc_nwc_oper'] = nwc_oper if 'nwc_oper' in locals() else None
+            row['roc_capital_base'] = capital_base if 'capital_base' in locals() else None
+        except Exception as e:
+            log_main.warning(f'error in roc calculation for {ticker=} at {analysis_date=}. \r\n{e}')
+
+        # the netnet csv line
+        log_main.info('netnet stock found!')
+        return (
+            NETNET,
+            (
+                f'{ticker},'
+                f'{analysis_date},'
+                f'{ncavps:.2f},'
+                f'{shareprice},'
+                f'{MoS_rate:.2f},'
+                f'{row["market_cap"]},'
+                f'{row["enterprise_value"]},'
+                f'{row.get("ey_shares_out", "")},'
+                f'{row.get("ey_net_income", "")},'
+                f'{row.get("operating_profit", "")},'
+                f'{row.get("ey_gross_debt", "")},'
+                f'{row["ey_pe"]},'
+                f'{row["ey_ev"]},'
+                f'{row.get("roc_current_assets", "")},'
+                f'{row.get("roc_current_liabilities", "")},'
+                f'{row.get("roc_cash_and_equivalents", "")},'
+                f'{row.get("roc_property", "")},'
+                f'{row.get("roc_nwc_oper", "")},'
+                f'{row.get("roc_capital_base", "")},'
+                f'{row["roc"]},'
+                f'{row.get("fs_gross_debt_fields", "")},'
+                f'{ncavdatadate},'
+                f'{st_disclosure_date},'
+                f'{row.get("fs_st_skew_days", "")},'
+                f'{row["st_report_type"]},'
+                f'{row["fs_report_type"]}\n'
+            ),
+        )
+    return None
 
 
 async def main() -> None:
     """Execute."""
-    jquant = jquant_client.JQuantAPIClient()
-    tickers: dict = jquant.get_tickers_for_dates(analysis_dates=analysis_dates)
-
-    data_calculated = defaultdict(lambda: defaultdict(dict))
-    fs_details = defaultdict(lambda: defaultdict(dict))
-    statements = defaultdict(lambda: defaultdict(dict))
-    ohlc_lock = Lock()
-    netnet_lock = Lock()
-    semaphore = Semaphore(SEMAPHORE_LIMIT)
-
+    jquant = jquant_client.JQuantAPIClient(max_connections=SEMAPHORE_MAX_LIMIT, requests_per_minute=API_REQUESTS_PER_MINUTE)
     timestamp = datetime.datetime.now(datetime.UTC).strftime('%Y%m%d_%H%M%S')
-    perf_log_file = f'{ULTIMATE_LOGDIR}/performance_{timestamp}.csv'
-    async with aiofiles.open(perf_log_file, 'w', encoding='utf-8') as f:
-        await f.write('analysis_date,semaphore_limit,tickers_processed,duration_seconds,tickers_per_minute\n')
-
-    for analysis_date in tickers:
-        log_main.info(f'*** Running for analysis date: {analysis_date} ***')
-        start_time = time.time()
-        tickers_processed_counter = {'count': 0, 'start': start_time}
-        stop_event = asyncio.Event()
+    # perf lines are short and rare: one line-buffered handle for the whole run, written to directly
+    with Path(f'{ULTIMATE_LOGDIR}/performance_{timestamp}.csv').open('a', encoding='utf-8', buffering=1) as perf_log:  # noqa: ASYNC230
+        perf_log.write('analysis_date,semaphore_limit,tickers_processed,duration_seconds,tickers_per_minute\n')
+        try:
+            await run_backtest(jquant, perf_log)
+        finally:
+            await jquant.aclose()
 
-        async def counted_process_ticker(ticker: str, *, analysis_date=analysis_date, tickers_processed_counter=tickers_processed_counter) -> None:
-            await process_ticker(ticker, analysis_date, data_calculated, fs_details, statements, ohlc_lock, netnet_lock, semaphore, jquant)
-            tickers_processed_counter['count'] += 1
 
-        tasks = [counted_process_ticker(t) for t in tickers[analysis_date]]
-        periodic_logger_task = asyncio.create_task(periodic_perf_logger(60, perf_log_file, analysis_date, SEMAPHORE_LIMIT, tickers_processed_counter, stop_event))
+async def run_backtest(jquant: jquant_client.JQuantAPIClient, perf_log: TextIO) -> None:
+    """Run the backtest data collection for all analysis dates with a shared API client."""
+    tickers: dict = jquant.get_tickers_for_dates(analysis_dates=analysis_dates)
 
-        await asyncio.gather(*tasks)
+    admission = AdmissionController(SEMAPHORE_LIMIT, max_cap=SEMAPHORE_MAX_LIMIT)
+
+    # fs_details / statements are per ticker, not per date: warm up the disk cache once for every ticker,
+    # a bounded pool of workers so only the in-flight tickers' payloads are in memory, process_ticker reads them back per date
+    all_tickers = set().union(*tickers.values())
+    log_main.info(f'*** Fetching fs_details / statements for {len(all_tickers)} tickers ***')
+    # tickers without fs_details can't be netnets on any date: don't schedule them at all
+    no_fs_tickers: set[str] = set()
+    to_prime = iter(all_tickers)
+
+    async def prime() -> None:
+        for ticker in to_prime:
+            fs_details, _ = await fetch_static(ticker, admission, jquant)
+            if not fs_details:
+                no_fs_tickers.add(ticker)
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(min(WORKERS_PER_DATE, len(all_tickers))):
+            tg.create_task(prime())
+    log_main.info(f'*** Skipping {len(no_fs_tickers)} tickers without fs_details ***')
+    tickers = {d: [t for t in date_tickers if t not in no_fs_tickers] for d, date_tickers in tickers.items()}
+
+    # one perf logger / throughput counter over all dates, it is also what tunes the admission cap
+    tickers_processed_counter = {'count': 0, 'start': time.time()}
+    stop_event = asyncio.Event()
+    periodic_logger_task = asyncio.create_task(periodic_perf_logger(60, perf_log, 'all', admission, tickers_processed_counter, stop_event))
+
+    date_slots = asyncio.Semaphore(DATE_CONCURRENCY)
+
+    async def run_date(analysis_date: str) -> None:
+        async with date_slots:
+            log_main.info(f'*** Running for analysis date: {analysis_date} ***')
+            start_time = time.time()
+            # market-wide closes by date, the ncav dates of one analysis date hardly overlap with the next one's
+            closes: dict[str, dict[str, float]] = {}
+            # the rows are only needed while the date's lines are built, so they go away with the date
+            data_calculated: dict[tuple[str, str], dict] = {}
+
+            # a fixed pool of workers pulls tickers from a shared iterator: only the in-flight tickers have a coroutine,
+            # the admission controller still decides how many of them hit the API
+            date_tickers = tickers[analysis_date]
+            results: list[tuple[str, str] | None] = [None] * len(date_tickers)
+            todo = iter(enumerate(date_tickers))
+
+            async def worker() -> None:
+                for i, ticker in todo:
+                    results[i] = await process_ticker(ticker, analysis_date, data_calculated, closes, admission, jquant)
+                    tickers_processed_counter['count'] += 1
+
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(min(WORKERS_PER_DATE, len(date_tickers))):
+                    tg.create_task(worker())
+
+            # one write per file per date
+            lines = {NETNET: [], NO_OHLC: []}
+            for kind, line in filter(None, results):
+                lines[kind].append(line)
+            if lines[NETNET]:
+                await asyncio.to_thread(_append_line, f'{ULTIMATE_LOGDIR}/tse_netnets_{analysis_date}.csv', ''.join(lines[NETNET]), header=NETNET_HEADER)
+            if lines[NO_OHLC]:
+                await asyncio.to_thread(_append_line, f'{ULTIMATE_LOGDIR}/no_ohlc_found_{analysis_date}.txt', ''.join(lines[NO_OHLC]))
+
+            duration = time.time() - start_time
+            tpm = len(date_tickers) / (duration / 60) if duration > 0 else 0
+            perf_log.write(f'{analysis_date},{admission.cap},{len(date_tickers)},{duration:.2f},{tpm:.2f}\n')
+            log_main.info(f'*** Finished run for analysis date: {analysis_date} ***')
+
+    # a failing date cancels the others, so nothing is still requesting when main() closes the client
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for analysis_date in tickers:
+                tg.create_task(run_date(analysis_date))
+    except BaseException:
+        periodic_logger_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await periodic_logger_task
+        raise
+    finally:
         stop_event.set()
-        await periodic_logger_task  # let it exit gracefully
-
-        duration = time.time() - start_time
-        tpm = len(tasks) / (duration / 60) if duration > 0 else 0
-        async with aiofiles.open(perf_log_file, 'a', encoding='utf-8') as f:
-            await f.write(f'{analysis_date},{SEMAPHORE_LIMIT},{tickers_processed_counter["count"]},{duration:.2f},{tpm:.2f}\n')
-        log_main.info(f'*** Finished run for analysis date: {analysis_date} ***')
+    await periodic_logger_task  # let it exit gracefully
 
     log_main.info(f'Global FS keys: {global_fs_keys}')
     log_main.info('-- Finished NETNET Backtest --')
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
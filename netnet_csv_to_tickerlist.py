@@ -1,7 +1,7 @@
 # ruff: noqa
 import os
-import csv
 import re
+import pandas as pd
 
 # folder containing CSV files
 folder_path = 'netnets'  # change to your folder path
@@ -17,12 +17,10 @@ for filename in os.listdir(folder_path):
             output_file = f'jquant_tickers_{date_str}.txt'
             input_path = os.path.join(folder_path, filename)
 
-            with open(input_path, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                tickers = [row['ticker'] for row in reader]
+            # only the ticker column, as str so codes like 130A0 are kept as-is, blank cells as '' (not NaN) like csv.DictReader
+            tickers = pd.read_csv(input_path, usecols=['ticker'], dtype=str, keep_default_na=False)['ticker']
 
             with open(output_file, 'w', encoding='utf-8') as f:
-                for ticker in tickers:
-                    f.write(f'{ticker}\n')
+                f.write(''.join(f'{ticker}\n' for ticker in tickers))
 
             print(f'Processed {filename} -> {output_file}')
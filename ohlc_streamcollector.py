@@ -4,7 +4,10 @@
 import dill
 
 # built-in
+import io
 import os
+import zlib
+import struct
 import time
 import uuid
 import pickle
@@ -46,7 +49,8 @@ OUTPUT_DATA_PATH_DILL = 'data/ohlc.dill'
 INPUT_TICKERS_PATH = "all_tickers/all_tickers.txt"
 
 # concurrency
-SEMAPHORE_LIMIT = 1
+SEMAPHORE_LIMIT = 5  # tickers fetched at once, same as the backtester (see README)
+API_REQUESTS_PER_MINUTE = None  # client-side rate limit (pages and retries count too), None: unlimited
 BATCH_SIZE = 200
 
 # GLOBAL LOCK FOR APPEND-ONLY WRITES
@@ -54,22 +58,63 @@ STREAM_WRITE_LOCK = asyncio.Lock()
 
 
 def nested_defaultdict_factory():
-    """Factory for pickle-friendly nested defaultdict."""
+    """Factory of the defaultdict datasets used to be; kept so snapshots pickled with it still load. New data is a plain dict."""
     return defaultdict(dict)
 
 
+# FRAMED RECORDS: MAGIC + (LENGTH, CRC-32) HEADER, SO A TORN / CORRUPT TAIL IS DETECTED ON LOAD
+# (the end-of-run snapshot is an unframed pickle at the head of the stream, read back together with the framed records)
+FRAME_MAGIC = b"JQF1"
+FRAME_HEADER = struct.Struct("<4sII")
+
+
+class TornRecordError(Exception):
+    """The stream ends in a record that was not completely / correctly written."""
+
+
+def _frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_record(f, loader):
+    head = f.read(FRAME_HEADER.size)
+    if not head:
+        raise EOFError
+    if not head.startswith(FRAME_MAGIC):
+        # unframed pickle: the snapshot, or a record appended before framing
+        f.seek(-len(head), os.SEEK_CUR)
+        try:
+            return loader(f)
+        except (EOFError, pickle.UnpicklingError, ValueError) as e:
+            raise TornRecordError from e
+    if len(head) < FRAME_HEADER.size:
+        raise TornRecordError
+    _, size, crc = FRAME_HEADER.unpack(head)
+    payload = f.read(size)
+    if len(payload) != size or zlib.crc32(payload) != crc:
+        raise TornRecordError
+    return loader(io.BytesIO(payload))
+
+
 # APPEND MULTIPLE RECORDS (e.g., list of (ticker, data_dict)) TO A BINARY STREAM
-def _append_records(saver, records, out_path):
+def _append_records(dumps, records, out_path):
     # records is an iterable of objects, e.g., [(ticker, data), ...]
+    # every record is framed with its length + CRC-32, so a reader finds the record boundaries and detects a torn tail:
+    # frame the whole batch first, then one write() + one fsync()
     try:
         Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-        #log_main.info(f"Appending {len(records)} records to {out_path} using {saver.__name__}...")
+        #log_main.info(f"Appending {len(records)} records to {out_path} using {dumps.__module__}...")
         #start_time = time.time()
-        with open(out_path, "ab") as f:
-            for rec in records:
-                saver(rec, f)
-            f.flush()
-            os.fsync(f.fileno())
+        kwargs = {"protocol": pickle.HIGHEST_PROTOCOL} if dumps is pickle.dumps else {}
+        buf = b"".join(_frame(dumps(rec, **kwargs)) for rec in records)
+        fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            view = memoryview(buf)
+            while view:  # os.write may write less than asked
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
         #log_main.info(f"Append to {out_path} finished in: {time.time() - start_time:.4f}s")
     except Exception as e:
         log_main.error(f"Failed to append to {out_path}: {e}")
@@ -83,52 +128,74 @@ async def append_records_non_blocking(records):
         loop = asyncio.get_running_loop()
         if DILL:
             await asyncio.gather(
-                loop.run_in_executor(None, _append_records, pickle.dump, records, OUTPUT_DATA_PATH_PICKLE),
-                loop.run_in_executor(None, _append_records, dill.dump, records, OUTPUT_DATA_PATH_DILL)
+                loop.run_in_executor(None, _append_records, pickle.dumps, records, OUTPUT_DATA_PATH_PICKLE),
+                loop.run_in_executor(None, _append_records, dill.dumps, records, OUTPUT_DATA_PATH_DILL)
             )
         else:
             await asyncio.gather(
-                loop.run_in_executor(None, _append_records, pickle.dump, records, OUTPUT_DATA_PATH_PICKLE)
+                loop.run_in_executor(None, _append_records, pickle.dumps, records, OUTPUT_DATA_PATH_PICKLE)
             )
 
 # STREAM READERS (SEQUENTIAL UNPICKLE UNTIL EOF)
-def iter_records(data_file_path, loader):
+def iter_records(data_file_path, loader, repair=False):
+    """Yield the records of the stream up to a torn tail (e.g. crash mid-append).
+
+    With repair=True the torn tail is also cut off the file, so new appends follow valid data: only the collector's
+    resume path does that, read-only loaders must not truncate a file a running collector may still be appending to.
+    """
     if not Path(data_file_path).exists():
         return
+    torn_at = None
     with open(data_file_path, "rb") as f:
         while True:
+            start = f.tell()
             try:
-                yield loader(f)
+                rec = _read_record(f, loader)
             except EOFError:
                 break
+            except TornRecordError:
+                torn_at = start
+                break
+            yield rec
+    if torn_at is None:
+        return
+    if repair:
+        log_main.warning(f"Torn record at offset {torn_at} in {data_file_path}, truncating to the last complete record.")
+        os.truncate(data_file_path, torn_at)
+    else:
+        log_main.warning(f"Torn record at offset {torn_at} in {data_file_path}, ignoring the rest of the file.")
 
-def iter_pickle_records(data_file_path):
-    yield from iter_records(data_file_path, pickle.load)
+def iter_pickle_records(data_file_path, repair=False):
+    yield from iter_records(data_file_path, pickle.load, repair)
 
 def iter_dill_records(data_file_path):
     yield from iter_records(data_file_path, dill.load)
 
 # OPTIONAL: RECONSTRUCT CURRENT SNAPSHOT (DICT) FROM APPEND-ONLY PICKLE STREAM
 def reconstruct_dataset_from_pickle_stream(stream_path):
-    dataset = defaultdict(nested_defaultdict_factory)
+    dataset = {}
     for rec in iter_pickle_records(stream_path):
-        if isinstance(rec, tuple) and len(rec) == 2:
+        if isinstance(rec, dict):  # snapshot written at the end of a run
+            dataset.update(rec)
+        elif isinstance(rec, tuple) and len(rec) == 2:
             ticker, data = rec
             dataset[ticker] = data
     return dataset
 
 # OPTIONAL: USE THIS INSTEAD OF pickle_load WHEN USING APPEND-ONLY STREAMS
-def pickle_stream_load_or_empty(data_file_path: str):
+def pickle_stream_load_or_empty(data_file_path: str, repair: bool = False):
     log_main.info(f"-- Attempting to load append-only stream from {data_file_path} --")
-    dataset = defaultdict(nested_defaultdict_factory)
+    dataset = {}
     try:
-        for rec in iter_pickle_records(data_file_path):
-            if isinstance(rec, tuple) and len(rec) == 2:
+        for rec in iter_pickle_records(data_file_path, repair):
+            if isinstance(rec, dict):  # snapshot written at the end of a run
+                dataset.update(rec)
+            elif isinstance(rec, tuple) and len(rec) == 2:
                 ticker, data = rec
                 dataset[ticker] = data
     except Exception as e:
         log_main.error(f"Failed to load append-only stream: {e}. Starting fresh.")
-        dataset = defaultdict(nested_defaultdict_factory)
+        dataset = {}
     return dataset
 
 
@@ -136,15 +203,23 @@ def pickle_stream_load_or_empty(data_file_path: str):
 # --- Data Persistence Functions ---
 
 def _save_data(saver, data, out_path):
-    """Generic synchronous save function."""
+    """Generic synchronous save function.
+
+    out_path is also the append stream, the only copy of the data: the snapshot goes to a temp file first,
+    and replaces the stream only once it is completely on disk.
+    """
     log_main.info(f"Starting save to {out_path} using {saver.__name__}...")
     start_time = time.time()
+    tmp_path = f"{out_path}.tmp"
     try:
-        with open(out_path, "wb") as f:
+        with open(tmp_path, "wb") as f:
             if saver == pickle.dump:
                 saver(data, f, protocol=pickle.HIGHEST_PROTOCOL)
             else:
                 saver(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, out_path)
         log_main.info(f"Save to {out_path} finished in: {time.time() - start_time:.4f}s")
     except Exception as e:
         log_main.error(f"Failed to save to {out_path}: {e}")
@@ -153,13 +228,13 @@ def pickle_load(data_file_path: str):
     log_main.info(f"-- Attempting to load data with PICKLE from {data_file_path} --")
     if not Path(data_file_path).exists():
         log_main.warning("Pickle file not found. Starting with an empty dataset.")
-        return defaultdict(nested_defaultdict_factory)
+        return {}
     try:
         with open(data_file_path, "rb") as f:
             return pickle.load(f)
     except Exception as e:
         log_main.error(f"Failed to load pickle file: {e}. Starting fresh.")
-        return defaultdict(nested_defaultdict_factory)
+        return {}
 
 async def save_data_non_blocking(data):
     """
@@ -185,40 +260,22 @@ async def fetch_data_for_ticker(ticker: str, jquant, semaphore: Semaphore):
     Returns None on failure.
     """
     async with semaphore:
-        log_main.debug(f"Processing ticker: {ticker}")
+        log_main.debug("Processing ticker: %s", ticker)
         try:
-            # Concurrently run the three API calls for the ticker
-            # analysis_dates
-            successful_results = await asyncio.gather(
-                # gets all the historical prices for the ticker
-                jquant.query_ohlc(params={"code": ticker}),
-                return_exceptions=True # Prevent one failed call from stopping others
-            )
-
-            batch_records = [r for r in successful_results if r is not None]
-
-            await append_records_non_blocking(batch_records)
-
-            # Check if any of the API calls failed
-            if any(isinstance(res, Exception) for res in successful_results):
-                log_main.error(f"One or more API calls failed for ticker {ticker}.")
-                return None
-
-            ticker_data = {'ohlc': successful_results[0]}
-            return (ticker, ticker_data) # Return a tuple for clean merging
-
+            # a single API call: all the historical prices for the ticker
+            ohlc = await jquant.query_ohlc(params={"code": ticker})
         except Exception as e:
-            log_main.error(f"Overall failure fetching data for {ticker}: {e}")
+            log_main.error(f"API call failed for ticker {ticker}: {e}")
             return None
 
+        return (ticker, {'ohlc': ohlc}) # Return a tuple for clean merging
+
 
 async def main() -> None:
-    # 1. Load initial data
-    data = pickle_load(OUTPUT_DATA_PATH_PICKLE)
+    # 1. Load initial data: the last snapshot + the records appended after it
+    data = pickle_stream_load_or_empty(OUTPUT_DATA_PATH_PICKLE, repair=True)
     log_main.info(f"Starting collection. Already have data for {len(data)} tickers.")
 
-    jquant = jquant_client.JQuantAPIClient()
-
     if TEST:
         all_tickers = [random.randint(1000,9999) for _ in range(420)]
     else:
@@ -236,29 +293,39 @@ async def main() -> None:
     semaphore = Semaphore(SEMAPHORE_LIMIT)
     total_batches = (len(tickers_to_process) + BATCH_SIZE - 1) // BATCH_SIZE
 
-    for i in range(0, len(tickers_to_process), BATCH_SIZE):
-        batch_tickers = tickers_to_process[i:i + BATCH_SIZE]
-        current_batch_num = i // BATCH_SIZE + 1
-        log_main.info(f"--- Starting Batch {current_batch_num}/{total_batches} with {len(batch_tickers)} tickers ---")
-
-        tasks = [fetch_data_for_ticker(ticker, jquant, semaphore) for ticker in batch_tickers]
-        batch_results = await asyncio.gather(*tasks)
-
-        # 4. CORRECTED MERGE LOGIC: Update the main data object, don't replace it
-        successful_fetches = 0
-        for result in batch_results:
-            if result:
-                ticker_code, ticker_data = result  # Unpack the (ticker, data) tuple
-                data[ticker_code] = ticker_data    # Update the main dictionary
-                successful_fetches += 1
-        
-        log_main.info(f"Collected data for {successful_fetches} tickers in this batch.")
-
-        # 5. NON-BLOCKING SAVE: Save checkpoint without freezing
-        log_main.info(f"--- Batch complete. Saving checkpoint for {len(data)} total tickers. ---")
-        await save_data_non_blocking(data)
-
-    log_main.info("--- All batches processed. Final data collection complete. ---")
+    # one pooled client for the whole run: connections are reused across tickers and batches
+    jquant = jquant_client.JQuantAPIClient(max_connections=SEMAPHORE_LIMIT, requests_per_minute=API_REQUESTS_PER_MINUTE)
+    try:
+        for i in range(0, len(tickers_to_process), BATCH_SIZE):
+            batch_tickers = tickers_to_process[i:i + BATCH_SIZE]
+            current_batch_num = i // BATCH_SIZE + 1
+            log_main.info(f"--- Starting Batch {current_batch_num}/{total_batches} with {len(batch_tickers)} tickers ---")
+
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(fetch_data_for_ticker(ticker, jquant, semaphore)) for ticker in batch_tickers]
+            batch_results = [task.result() for task in tasks]
+
+            # 4. CORRECTED MERGE LOGIC: Update the main data object, don't replace it
+            batch_records = []
+            for result in batch_results:
+                if result:
+                    ticker_code, ticker_data = result  # Unpack the (ticker, data) tuple
+                    data[ticker_code] = ticker_data    # Update the main dictionary
+                    batch_records.append(result)
+            successful_fetches = len(batch_records)
+
+            log_main.info(f"Collected data for {successful_fetches} tickers in this batch.")
+
+            # 5. APPEND-ONLY CHECKPOINT: only this batch's (ticker, data) records are written, not the whole dataset
+            log_main.info(f"--- Batch complete. Appending checkpoint for {successful_fetches} tickers. ---")
+            await append_records_non_blocking(batch_records)
+    finally:
+        await jquant.aclose()
+
+    # 6. FINAL SNAPSHOT: one compact dict replaces the previous snapshot + appended records (loaders read a single dict)
+    log_main.info(f"--- All batches processed. Saving snapshot for {len(data)} total tickers. ---")
+    await save_data_non_blocking(data)
+    log_main.info("--- Final data collection complete. ---")
 
 
 if __name__ == "__main__":
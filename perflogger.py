@@ -5,22 +5,27 @@ Logs into a csv-style file.
 
 import time
 import asyncio
-import aiofiles
+from typing import TextIO
+
+from admission import AdmissionController
 
 
 async def periodic_perf_logger(  # noqa: PLR0913
     period: int,
-    perf_log_file: str,
+    perf_log: TextIO,
     analysis_date: str,
-    semaphore_limit: int,
+    admission: AdmissionController,
     tickers_processed_counter: dict,
     stop_event: asyncio.Event,
 ) -> None:
-    """Write performance metrics until stop_event is set."""
+    """Write performance metrics to the (line-buffered) perf_log until stop_event is set, and tune the concurrency cap on the last period's throughput."""
+    last_processed = 0
     while not stop_event.is_set():
         await asyncio.sleep(period)
         processed = tickers_processed_counter['count']
         duration = time.time() - tickers_processed_counter['start']
         tpm = processed / (duration / 60) if duration > 0 else 0
-        async with aiofiles.open(perf_log_file, 'a', encoding='utf-8') as f:
-            await f.write(f'{analysis_date},{semaphore_limit},{processed},{duration:.2f},{tpm:.2f}\n')
+        perf_log.write(f'{analysis_date},{admission.cap},{processed},{duration:.2f},{tpm:.2f}\n')
+        if not stop_event.is_set():  # the last period is cut short by the end of the date, don't tune on it
+            await admission.tune((processed - last_processed) / period)
+        last_processed = processed
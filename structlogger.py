@@ -1,8 +1,11 @@
 """Structured logger configuration."""
 
+import atexit
 import datetime
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import threading
 from pathlib import Path
@@ -10,13 +13,40 @@ from pathlib import Path
 import structlog
 
 
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+
+    """QueueHandler for a same-process listener: records are passed as-is, the real handlers do all formatting (exc_info included)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _queued(*handlers: logging.Handler) -> logging.Handler:
+    """Wrap blocking handlers: the caller only enqueues records, a listener thread does the file writes."""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # drains the queue on exit
+    return _LocalQueueHandler(log_queue)
+
+
+_configured = False
+
+
 def configure_logging(log_dir: str = 'jquant_logs', mode: str = None) -> None:
     """Configure structlog for fast file logging or colorized console logging.
 
     Args:
         log_dir: Directory for log files when mode is "file".
         mode: "file" or "console". If None, reads JQ_LOG_MODE env var. Defaults to "file".
+
+    Only the first call configures anything: a second one would start new listener threads and log files next to the first ones.
     """
+    global _configured  # noqa: PLW0603
+    if _configured:
+        return
+    _configured = True
+
     selected_mode = (mode or os.getenv('JQ_LOG_MODE', 'file')).lower()
     if selected_mode not in {'file', 'console'}:
         selected_mode = 'file'
@@ -48,15 +78,15 @@ def configure_logging(log_dir: str = 'jquant_logs', mode: str = None) -> None:
         exception_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s %(message)s\n%(exc_info)s'))
         handlers.append(exception_handler)
 
-        # Root logger writes to files
-        logging.basicConfig(level=logging.INFO, handlers=handlers, force=True)
+        # Root logger writes to files, from a background thread so the event loop never blocks on disk
+        logging.basicConfig(level=logging.INFO, handlers=[_queued(*handlers)], force=True)
 
         # httpx to its own file, no propagation
         httpx_logger = logging.getLogger('httpx')
         httpx_logger.setLevel(logging.INFO)
         httpx_logger.propagate = False
         httpx_logger.handlers.clear()
-        httpx_logger.addHandler(httpx_handler)
+        httpx_logger.addHandler(_queued(httpx_handler))
 
         # structlog integrates with stdlib logging (file format handled by logging.Formatter)
         structlog.configure(
@@ -64,13 +94,13 @@ def configure_logging(log_dir: str = 'jquant_logs', mode: str = None) -> None:
                 structlog.contextvars.merge_contextvars,
                 structlog.stdlib.add_logger_name,
                 structlog.stdlib.add_log_level,
-                structlog.processors.CallsiteParameterAdder({structlog.processors.CallsiteParameter.FUNC_NAME}),
-                structlog.processors.format_exc_info,
+                # no CallsiteParameterAdder: the formatter's %(funcName)s already comes from stdlib logging, without a frame lookup per call
+                # no format_exc_info: exc_info is passed on to stdlib logging, so the formatters print the traceback
                 structlog.stdlib.render_to_log_kwargs,
             ],
             context_class=dict,
             logger_factory=structlog.stdlib.LoggerFactory(),
-            wrapper_class=structlog.stdlib.BoundLogger,
+            wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
             cache_logger_on_first_use=True,
         )
 
@@ -102,7 +132,7 @@ def configure_logging(log_dir: str = 'jquant_logs', mode: str = None) -> None:
             ],
             context_class=dict,
             logger_factory=structlog.stdlib.LoggerFactory(),
-            wrapper_class=structlog.stdlib.BoundLogger,
+            wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
             cache_logger_on_first_use=True,
         )
 
@@ -128,6 +158,6 @@ def configure_logging(log_dir: str = 'jquant_logs', mode: str = None) -> None:
         threading.excepthook = thread_exception_hook
 
 
-def get_logger(name: str) -> structlog.stdlib.BoundLogger:
+def get_logger(name: str) -> structlog.typing.FilteringBoundLogger:
     """Get a configured structlog logger with the specified name."""
     return structlog.get_logger(name)
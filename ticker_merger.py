@@ -1,18 +1,17 @@
 """load all tickers from all ticker files then return a set."""
 from pathlib import Path
 
-tickers = []
+tickers = set()
 
 DIR = 'jquant_tickers/'
 OUT_FILE = 'all_tickers/all_tickers.txt'
 
 tickerfiles = list(Path(DIR).glob('*.txt'))
 
+# bytes: no decode / re-encode, splitlines also drops the '\r' of windows line endings
 for t in tickerfiles:
-    t_text = Path(t).read_text(encoding='utf-8')
-    tickers.extend(t_text.split('\n'))
+    tickers.update(t.read_bytes().splitlines())
 
-tickers = set(tickers)
-
-Path(OUT_FILE).write_text('\n'.join(tickers))
+tickers.discard(b'')
 
+Path(OUT_FILE).write_bytes(b'\n'.join(tickers))